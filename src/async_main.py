@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+from downloader import CHUNK_SIZE
+from main import (
+    DownloadingError, VideoResult, VideoStatus, convert_to_mp3,
+    download_functions, find_existing, flat_playlist, format_size,
+    format_time, get_and_validate_dir_path, main, print_summary,
+    sanitize_filename, scan_existing_files, select_stream, skip_video,
+)
+from metadata import Metadata, metadata_functions
+
+if TYPE_CHECKING:
+    import aiohttp
+    import pytube
+
+MAX_CONCURRENT_VIDEOS = 8
+MAX_CONNECTIONS = 32
+
+
+def _resolve_stream(
+    url: str,
+    only_audio: bool,
+) -> tuple[pytube.YouTube, pytube.Stream | VideoStatus]:
+    """Loads a video with pytube and selects its stream (blocking)."""
+    import pytube
+
+    vid = pytube.YouTube(url)
+    stream = select_stream(vid, only_audio)
+    if isinstance(stream, VideoStatus):
+        return vid, stream
+    # Fetch the remaining metadata while still off the event loop.
+    _ = vid.author, vid.length
+    return vid, stream
+
+
+async def _fetch(session: aiohttp.ClientSession, url: str) -> bytes:
+    async with session.get(url) as res:
+        res.raise_for_status()
+        return await res.read()
+
+
+async def _fetch_thumbnail(session: aiohttp.ClientSession,
+                           entry: dict[str, Any]) -> bytes:
+    """Fetches the largest thumbnail listed in a flat playlist entry."""
+    thumbnails = entry.get("thumbnails") or []
+    if not thumbnails:
+        return b""
+    return await _fetch(session, thumbnails[-1]["url"])
+
+
+async def _download(session: aiohttp.ClientSession,
+                    url: str,
+                    path: Path) -> None:
+    """Streams `url` into `path`, removing the file on failure."""
+    import aiofiles
+
+    try:
+        async with session.get(url) as res:
+            res.raise_for_status()
+            async with aiofiles.open(path, "wb") as file:
+                async for chunk in res.content.iter_chunked(CHUNK_SIZE):
+                    await file.write(chunk)
+    except BaseException as e:
+        path.unlink(missing_ok=True)
+        raise e
+
+
+async def process(entry: dict[str, Any],
+                  i: int,
+                  count: int,
+                  dir_path: Path,
+                  file_type: str,
+                  only_audio: bool,
+                  existing: dict[str, int],
+                  claimed: set[str],
+                  session: aiohttp.ClientSession,
+                  semaphore: asyncio.Semaphore) -> VideoResult:
+    """Selects, downloads and tags a single video of a playlist."""
+    title: Optional[str] = entry.get("title")
+    if title is not None:
+        found = find_existing(title, int(entry.get("duration") or 0),
+                              entry["url"], i, count, file_type,
+                              existing, print)
+        if found is not None:
+            return found
+    async with semaphore:
+        (vid, stream), cover_data = await asyncio.gather(
+            asyncio.to_thread(_resolve_stream, entry["url"], only_audio),
+            _fetch_thumbnail(session, entry),
+        )
+        if isinstance(stream, VideoStatus):
+            return skip_video(stream, entry["url"], i, count, print)
+        found = find_existing(stream.title, vid.length, vid.watch_url,
+                              i, count, file_type, existing, print)
+        if found is not None:
+            return found
+        file_name = sanitize_filename(stream.title)
+        file_path = dir_path / f"{file_name}.{file_type}"
+        # Checked and claimed without awaiting in between, so repeated
+        # videos never download into the same files concurrently.
+        if file_path.name in claimed:
+            print(f"Found {i}/{count}: {stream.title} "
+                  f"({format_time(vid.length)}) - duplicate")
+            return VideoResult(status=VideoStatus.FOUND,
+                               watch_url=vid.watch_url,
+                               length=vid.length)
+        claimed.add(file_path.name)
+        print(f"Downloading {i}/{count}: {stream.title} "
+              f"({format_time(vid.length)})")
+        if not cover_data:
+            cover_data = await _fetch(session, vid.thumbnail_url)
+        metadata = Metadata(title=stream.title,
+                            artist=vid.author,
+                            cover_data=cover_data)
+        try:
+            if file_type == "mp3":
+                temp_path = dir_path / f"{file_name}.temp.mp4"
+                try:
+                    await _download(session, stream.url, temp_path)
+                    await asyncio.to_thread(convert_to_mp3,
+                                            temp_path, file_path)
+                finally:
+                    temp_path.unlink(missing_ok=True)
+            else:
+                await _download(session, stream.url, file_path)
+            if file_type in metadata_functions:
+                await asyncio.to_thread(metadata_functions[file_type],
+                                        file_path, metadata)
+        except asyncio.CancelledError as e:
+            file_path.unlink(missing_ok=True)
+            print(f"deleted `{str(file_path)}`")
+            raise e
+    file_size = file_path.stat().st_size
+    print(f"Downloaded {i}/{count}: {stream.title} - {format_size(file_size)}")
+    return VideoResult(status=VideoStatus.DOWNLOADED,
+                       watch_url=vid.watch_url,
+                       length=vid.length,
+                       file_size=file_size)
+
+
+async def download_playlist_async(playlist_url: str,
+                                  output: Optional[str],
+                                  file_type: str,
+                                  only_audio: bool) -> None:
+    """Asynchronous counterpart of `main.download_playlist`.
+    All HTTP traffic is multiplexed over a single `aiohttp` session
+    while up to `MAX_CONCURRENT_VIDEOS` videos are processed at once.
+    """
+    import aiohttp
+
+    assert file_type in download_functions
+
+    title, entries = await asyncio.to_thread(flat_playlist, playlist_url)
+    count = len(entries)
+    dir_path = get_and_validate_dir_path(output, title, only_audio)
+    existing = scan_existing_files(dir_path)
+    claimed: set[str] = set()
+    print(f"Downloading playlist: {title}\n")
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_VIDEOS)
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS)
+    try:
+        async with (aiohttp.ClientSession(connector=connector) as session,
+                    asyncio.TaskGroup() as group):
+            # A failing video cancels the others instead of leaving
+            # them running in the background.
+            tasks = [
+                group.create_task(process(entry, i, count, dir_path,
+                                          file_type, only_audio, existing,
+                                          claimed, session, semaphore))
+                for i, entry in enumerate(entries, start=1)
+            ]
+    except* DownloadingError as errors:
+        # `main` reports a single error, not the group around it.
+        raise errors.exceptions[0]
+    results = [task.result() for task in tasks]
+    print_summary(title, count, dir_path, results)
+
+
+def download_playlist(playlist_url: str,
+                      output: Optional[str],
+                      file_type: str,
+                      only_audio: bool) -> None:
+    """Runs `download_playlist_async` on a new event loop."""
+    asyncio.run(download_playlist_async(playlist_url, output,
+                                        file_type, only_audio))
+
+
+if __name__ == "__main__":
+    main(download_playlist)
@@ -0,0 +1,83 @@
+import json
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "ytpc" / "meta.sqlite"
+DEFAULT_TTL = 6 * 60 * 60
+
+
+class CachedVideo(NamedTuple):
+    """Metadata of a previously resolved video."""
+    video_id: str
+    title: str
+    author: str
+    length: int
+    watch_url: str
+    thumbnail_url: str
+    stream_url: str
+    only_audio: bool
+    # Rows written before stream URLs had an expiry count as expired.
+    url_expires_at: int = 0
+
+
+def stream_url_expiry(url: str, ttl: int = DEFAULT_TTL) -> int:
+    """Returns when a signed stream URL expires, read from its `expire`
+    parameter or assumed to be `ttl` seconds from now.
+    """
+    expire = parse_qs(urlparse(url).query).get("expire")
+    if expire and expire[0].isdigit():
+        return int(expire[0])
+    return int(time.time()) + ttl
+
+
+class MetadataCache:
+    """SQLite-backed cache of video metadata keyed by video ID.
+    A single connection is shared between threads behind a lock.
+    """
+    def __init__(self,
+                 path: Path = DEFAULT_CACHE_PATH,
+                 ttl: int = DEFAULT_TTL) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS videos ("
+            "video_id TEXT PRIMARY KEY, json TEXT, ts INTEGER)"
+        )
+        self._conn.commit()
+
+    def get(self, video_id: str) -> Optional[CachedVideo]:
+        """Returns the cached metadata of a video if it is still fresh."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT json, ts FROM videos WHERE video_id = ?",
+                (video_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        data, ts = row
+        if time.time() - ts > self.ttl:
+            return None
+        return CachedVideo(video_id=video_id, **json.loads(data))
+
+    def put(self, video: CachedVideo) -> None:
+        """Inserts or replaces the cached metadata of a video."""
+        data = video._asdict()
+        del data["video_id"]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO videos VALUES (?, ?, ?)",
+                (video.video_id, json.dumps(data), int(time.time())),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,207 @@
+import os
+import re
+import requests
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+CHUNK_SIZE = 1 << 20
+TIMEOUT = 10
+# Connections kept per host by the shared session.
+POOL_SIZE = 16
+
+
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE,
+                          pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Shared by all threads so connections (and TLS sessions) are reused.
+SESSION = _make_session()
+
+
+class RangeNotSatisfied(Exception):
+    """Raised when the server ignores a `Range` header."""
+
+
+class DownloadCanceled(Exception):
+    """Raised inside a download once its cancel event is set."""
+
+
+def _check_canceled(canceled: Optional[threading.Event]) -> None:
+    if canceled is not None and canceled.is_set():
+        raise DownloadCanceled()
+
+
+def _download_single(url: str,
+                     path: Path,
+                     canceled: Optional[threading.Event]) -> None:
+    """Downloads a file over a single connection."""
+    with SESSION.get(url, stream=True, timeout=TIMEOUT) as res:
+        res.raise_for_status()
+        with open(path, "wb") as file:
+            for chunk in res.iter_content(CHUNK_SIZE):
+                _check_canceled(canceled)
+                file.write(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def _download_range(url: str,
+                    fd: int,
+                    lo: int,
+                    hi: int,
+                    canceled: Optional[threading.Event],
+                    failed: threading.Event) -> None:
+    """Writes bytes `lo..=hi` of the resource into the same offsets of `fd`.
+    Sets `failed` on error and stops once another range set it.
+    """
+    headers = {"Range": f"bytes={lo}-{hi}"}
+    try:
+        with SESSION.get(url, headers=headers,
+                         stream=True, timeout=TIMEOUT) as res:
+            res.raise_for_status()
+            if res.status_code != 206:
+                raise RangeNotSatisfied()
+            offset = lo
+            for chunk in res.iter_content(CHUNK_SIZE):
+                _check_canceled(canceled)
+                _check_canceled(failed)
+                os.pwrite(fd, chunk, offset)
+                offset += len(chunk)
+    except BaseException as e:
+        failed.set()
+        raise e
+
+
+def _download_ranges(url: str,
+                     path: Path,
+                     size: int,
+                     chunks: int,
+                     canceled: Optional[threading.Event]) -> None:
+    """Downloads `size` bytes split over `chunks` parallel requests."""
+    chunk_len = -(-size // chunks)
+    ranges = [(lo, min(lo + chunk_len, size) - 1)
+              for lo in range(0, size, chunk_len)]
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, size)
+        else:
+            os.ftruncate(fd, size)
+        failed = threading.Event()
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [executor.submit(_download_range,
+                                       url, fd, lo, hi, canceled, failed)
+                       for lo, hi in ranges]
+        errors = [e for f in futures if (e := f.exception()) is not None]
+        # Ranges stopped by a sibling's failure only report the cancel.
+        for error in errors:
+            if not isinstance(error, DownloadCanceled):
+                raise error
+        if errors:
+            raise errors[0]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def download_ranged(url: str,
+                    path: Path,
+                    chunks: int = 8,
+                    canceled: Optional[threading.Event] = None) -> None:
+    """Downloads `url` into `path` using `chunks` parallel byte-range
+    requests. Falls back to a single connection when the server or the
+    platform does not support ranges. The file is removed if the download fails or
+    `canceled` is set.
+    """
+    try:
+        head = SESSION.head(url, allow_redirects=True, timeout=TIMEOUT)
+        head.raise_for_status()
+        size = int(head.headers.get("Content-Length", 0))
+        # Ranges are written with `os.pwrite`, which only exists on Unix.
+        if (size == 0 or head.headers.get("Accept-Ranges") != "bytes"
+                or not hasattr(os, "pwrite")):
+            _download_single(url, path, canceled)
+            return
+        try:
+            _download_ranges(url, path, size, chunks, canceled)
+        except RangeNotSatisfied:
+            _download_single(url, path, canceled)
+    except BaseException as e:
+        path.unlink(missing_ok=True)
+        raise e
+
+
+def _url_content_length(url: str) -> Optional[int]:
+    """Returns the resource length encoded in a stream URL's `clen`."""
+    clen = parse_qs(urlparse(url).query).get("clen")
+    if clen and clen[0].isdigit():
+        return int(clen[0])
+    return None
+
+
+def _content_range(
+    res: requests.Response,
+) -> tuple[Optional[int], Optional[int]]:
+    """Parses the first byte and total length of a `Content-Range` header
+    (`bytes a-b/total` or `bytes */total`).
+    """
+    match = re.fullmatch(r"bytes (?:(\d+)-\d+|\*)/(\d+|\*)",
+                         res.headers.get("Content-Range", "").strip())
+    if match is None:
+        return None, None
+    start, total = match.groups()
+    return (int(start) if start is not None else None,
+            int(total) if total != "*" else None)
+
+
+def download_resumable(url: str,
+                       path: Path,
+                       canceled: Optional[threading.Event] = None) -> None:
+    """Downloads `url` into `path` through a `.part` file. A `.part` file
+    left behind by a failed or canceled download is resumed with a
+    `Range` request instead of starting over, provided the server
+    confirms it continues the same resource.
+    """
+    part_path = path.with_name(f"{path.name}.part")
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    expected = _url_content_length(url)
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with SESSION.get(url, headers=headers,
+                     stream=True, timeout=TIMEOUT) as res:
+        if offset and res.status_code == 416:
+            # Only complete when the `.part` is exactly the resource length.
+            _, total = _content_range(res)
+            resumable = total == offset and expected in (None, total)
+            if resumable:
+                part_path.rename(path)
+                return
+        else:
+            res.raise_for_status()
+            resumable = True
+            if offset and res.status_code == 206:
+                start, total = _content_range(res)
+                resumable = (start == offset and total is not None
+                             and expected in (None, total))
+            if resumable:
+                # Servers ignoring the range resend the whole file.
+                mode = "ab" if res.status_code == 206 else "wb"
+                with open(part_path, mode) as file:
+                    for chunk in res.iter_content(CHUNK_SIZE):
+                        _check_canceled(canceled)
+                        file.write(chunk)
+    if not resumable:
+        # The `.part` file belongs to another resource, so start over.
+        part_path.unlink()
+        download_resumable(url, path, canceled)
+        return
+    part_path.rename(path)
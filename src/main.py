@@ -1,16 +1,39 @@
-import pytube
+from __future__ import annotations
+
+import argparse
+import os
 import requests
+import shutil
+import subprocess
 import sys
+import threading
+import time
 
-from moviepy.audio.io.AudioFileClip import AudioFileClip
+from concurrent.futures import (
+    FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+)
+from dataclasses import dataclass
+from enum import Enum, auto
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
 from pathvalidate import sanitize_filename
-from pytube import Playlist, Stream
-from pytube.exceptions import AgeRestrictedError
-from typing import Callable, Optional
+from typing import TYPE_CHECKING, Any, Callable, Optional
 
+from cache import CachedVideo, MetadataCache, stream_url_expiry
+from downloader import (
+    POOL_SIZE, SESSION, TIMEOUT, DownloadCanceled, download_ranged,
+    download_resumable,
+)
 from metadata import Metadata, metadata_functions
 
+if TYPE_CHECKING:
+    import pytube
+
+# Titles are sanitized on every lookup, so memoize the regex work.
+sanitize_filename = lru_cache(maxsize=4096)(sanitize_filename)
+
+
 class DownloadingError(Exception):
     """Basic class covering all posible errors encountered
     while downloading YouTube videos.
@@ -20,16 +43,15 @@ class DownloadingError(Exception):
         self.msg = msg
 
 
+_SIZE_UNITS = ((1 << 30, "GiB"), (1 << 20, "MiB"), (1 << 10, "KiB"))
+
+
 def format_size(size: int) -> str:
     """Returns a human readable representation of a number of bytes."""
-    if size < 1024:
-        return f"{size} bytes"
-    elif size < 1024**2:
-        return f"{size/1024:.2f} KiB"
-    elif size < 1024**3:
-        return f"{size/1024**2:.2f} MiB"
-    else:
-        return f"{size/1024**3:.2f} GiB"
+    for threshold, suffix in _SIZE_UNITS:
+        if size >= threshold:
+            return f"{size/threshold:.2f} {suffix}"
+    return f"{size} bytes"
 
 
 def format_time(secs: int, long: bool = False) -> str:
@@ -77,44 +99,397 @@ def get_and_validate_dir_path(output: Optional[str],
     return dir_path
 
 
-def fetch_url_raw(url: str) -> bytes:
-    res = requests.get(url)
-    res.raise_for_status()
-    return res.content
+def fetch_url_raw(url: str, session: requests.Session = SESSION) -> bytes:
+    """Fetches the body of `url` over the shared connection pool."""
+    with session.get(url, stream=True, timeout=TIMEOUT) as res:
+        res.raise_for_status()
+        res.raw.decode_content = True
+        buf = BytesIO()
+        shutil.copyfileobj(res.raw, buf, length=64 * 1024)
+    return buf.getvalue()
 
 
-def download_mp4(stream: pytube.Stream, dir_path: Path, file_name: str) -> None:
-    stream.download(str(dir_path), f"{file_name}.mp4")
+def flat_playlist(url: str) -> tuple[str, list[dict[str, Any]]]:
+    """Returns the title and the flat entries (id, url, title and
+    duration) of every video in a playlist using a single request.
+    """
+    import yt_dlp
+
+    options = {
+        "extract_flat": "in_playlist",
+        "quiet": True,
+        "skip_download": True,
+    }
+    try:
+        with yt_dlp.YoutubeDL(options) as ydl:
+            info = ydl.extract_info(url, download=False)
+    except yt_dlp.utils.DownloadError:
+        raise DownloadingError(f"Could not load playlist `{url}`")
+    if info is None or info.get("_type") != "playlist":
+        raise DownloadingError(f"Could not load playlist `{url}`")
+    return info["title"], list(info["entries"])
+
 
+def download_mp4(stream_url: str,
+                 dir_path: Path,
+                 file_name: str,
+                 canceled: threading.Event) -> None:
+    download_resumable(stream_url, dir_path / f"{file_name}.mp4", canceled)
 
-def download_mp3(stream: pytube.Stream, dir_path: Path, file_name: str) -> None:
+
+def convert_to_mp3(src_path: Path, file_path: Path) -> None:
+    """Converts the audio track of `src_path` into an MP3 at `file_path`."""
+    try:
+        subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-y", "-i", str(src_path),
+             "-vn", "-c:a", "libmp3lame", "-q:a", "2", str(file_path)],
+            check=True,
+        )
+    except FileNotFoundError:
+        raise DownloadingError("`ffmpeg` must be installed")
+    except subprocess.CalledProcessError:
+        file_path.unlink(missing_ok=True)
+        raise DownloadingError(f"Failed to convert `{file_path.stem}` to MP3")
+
+
+def download_mp3(stream_url: str,
+                 dir_path: Path,
+                 file_name: str,
+                 canceled: threading.Event) -> None:
     file_path = dir_path / f"{file_name}.mp3"
-    temp_name = "temp_file.mp4"
+    temp_name = f"{file_name}.temp.mp4"
     temp_path = dir_path / temp_name
+    download_ranged(stream_url, temp_path,
+                    chunks=RANGE_CHUNKS, canceled=canceled)
     try:
-        stream.download(str(dir_path), temp_name)
-    except KeyboardInterrupt as e:
+        convert_to_mp3(temp_path, file_path)
+    finally:
         temp_path.unlink(missing_ok=True)
-        raise e
-    audio = AudioFileClip(str(temp_path))
-    audio.write_audiofile(str(file_path), codec="mp3",
-                          verbose=False, logger=None)
-    temp_path.unlink()
 
 
-type DownloadFunction = Callable[[pytube.Stream, Path, str], None]
+type DownloadFunction = Callable[[str, Path, str, threading.Event], None]
 download_functions: dict[str, DownloadFunction] = {
     "mp4": download_mp4,
     "mp3": download_mp3,
 }
 
 
+MAX_WORKERS = 8
+# Videos resolved ahead of the ones currently being downloaded.
+RESOLVE_LOOKAHEAD = 2
+MAX_TAGGING_WORKERS = 2
+# Ranges per ranged download, so all workers together fit the session pool.
+RANGE_CHUNKS = max(1, POOL_SIZE // MAX_WORKERS)
+# Cached stream URLs this close to expiring are resolved again.
+STREAM_URL_MARGIN = 10 * 60
+
+
+class VideoStatus(Enum):
+    DOWNLOADED = auto()
+    FOUND = auto()
+    AGE_RESTRICTED = auto()
+    NO_STREAM = auto()
+    NO_AUDIO = auto()
+    CANCELED = auto()
+
+
+@dataclass(kw_only=True)
+class VideoResult:
+    status: VideoStatus
+    watch_url: str
+    length: int = 0
+    file_size: int = 0
+    description: str = ""
+    file_path: Optional[Path] = None
+    metadata: Optional[Metadata] = None
+
+
+@dataclass(kw_only=True)
+class ResolvedVideo:
+    """A video whose stream was selected but is not downloaded yet."""
+    video: CachedVideo
+    i: int
+    count: int
+    from_cache: bool
+
+
+class ProgressLogger:
+    """Shows a progress bar of the playlist and prints messages from
+    worker threads above it. Rendering happens on rich's refresh thread,
+    so workers never write to stdout directly.
+    """
+    def __init__(self, count: int) -> None:
+        from rich.progress import Progress
+
+        self._progress = Progress(transient=True)
+        self._task = self._progress.add_task("Downloading", total=count)
+        self._progress.start()
+
+    def log(self, msg: str) -> None:
+        self._progress.console.print(msg, markup=False, highlight=False)
+
+    def advance(self) -> None:
+        """Marks one more video of the playlist as finished."""
+        self._progress.advance(self._task)
+
+    def close(self) -> None:
+        """Stops the progress bar."""
+        self._progress.stop()
+
+
+type Log = Callable[[str], None]
+
+_SKIP_MESSAGES: dict[VideoStatus, str] = {
+    VideoStatus.AGE_RESTRICTED: "Video {} is age restricted",
+    VideoStatus.NO_STREAM: "No stream found for video {}",
+    VideoStatus.NO_AUDIO: "Video {} has no audio",
+}
+
+
+def scan_existing_files(dir_path: Path) -> dict[str, int]:
+    """Maps the name of every file in `dir_path` to its size."""
+    with os.scandir(dir_path) as it:
+        return {e.name: e.stat().st_size for e in it if e.is_file()}
+
+
+def find_existing(title: str,
+                  length: int,
+                  watch_url: str,
+                  i: int,
+                  count: int,
+                  file_type: str,
+                  existing: dict[str, int],
+                  log: Log) -> Optional[VideoResult]:
+    """Returns a `FOUND` result if the video was already downloaded."""
+    file_size = existing.get(f"{sanitize_filename(title)}.{file_type}")
+    if file_size is None:
+        return None
+    log(f"Found {i}/{count}: {title} ({format_time(length)})")
+    return VideoResult(status=VideoStatus.FOUND,
+                       watch_url=watch_url,
+                       length=length,
+                       file_size=file_size)
+
+
+def select_stream(vid: pytube.YouTube,
+                  only_audio: bool) -> pytube.Stream | VideoStatus:
+    """Returns the stream to download or the reason the video is skipped."""
+    from pytube.exceptions import AgeRestrictedError
+
+    try:
+        stream = vid.streams\
+                    .filter(file_extension="mp4",
+                            only_audio=only_audio)\
+                    .first()
+    except AgeRestrictedError:
+        return VideoStatus.AGE_RESTRICTED
+    if stream is None:
+        return VideoStatus.NO_STREAM
+    if only_audio and not stream.includes_audio_track:
+        return VideoStatus.NO_AUDIO
+    return stream
+
+
+def skip_video(status: VideoStatus,
+               watch_url: str,
+               i: int,
+               count: int,
+               log: Log) -> VideoResult:
+    """Logs why a video is skipped and returns its result."""
+    log(_SKIP_MESSAGES[status].format(f"{i}/{count}"))
+    return VideoResult(status=status, watch_url=watch_url)
+
+
+def _resolve_with_pytube(url: str,
+                         i: int,
+                         count: int,
+                         only_audio: bool,
+                         cache: MetadataCache) -> ResolvedVideo | VideoStatus:
+    """Loads a video with pytube, selects its stream and caches both."""
+    import pytube
+
+    vid = pytube.YouTube(url)
+    stream = select_stream(vid, only_audio)
+    if isinstance(stream, VideoStatus):
+        return stream
+    video = CachedVideo(video_id=vid.video_id,
+                        title=stream.title,
+                        author=vid.author,
+                        length=vid.length,
+                        watch_url=vid.watch_url,
+                        thumbnail_url=vid.thumbnail_url,
+                        stream_url=stream.url,
+                        only_audio=only_audio,
+                        url_expires_at=stream_url_expiry(stream.url))
+    cache.put(video)
+    return ResolvedVideo(video=video, i=i, count=count, from_cache=False)
+
+
+def _resolve_video(entry: dict[str, Any],
+                   i: int,
+                   count: int,
+                   file_type: str,
+                   only_audio: bool,
+                   logger: ProgressLogger,
+                   cache: MetadataCache,
+                   existing: dict[str, int]) -> VideoResult | ResolvedVideo:
+    """Selects the stream of a single video of a playlist.
+    The video is only loaded with pytube when it is not already on disk
+    and no unexpired stream URL of it is cached.
+    """
+    cached = cache.get(entry["id"])
+    title: Optional[str] = entry.get("title")
+    length = int(entry.get("duration") or 0)
+    if cached is not None:
+        title = cached.title
+        length = cached.length
+    if title is not None:
+        found = find_existing(title, length, entry["url"], i, count,
+                              file_type, existing, logger.log)
+        if found is not None:
+            return found
+    if (cached is not None and cached.only_audio == only_audio
+            and cached.url_expires_at > time.time() + STREAM_URL_MARGIN):
+        return ResolvedVideo(video=cached, i=i, count=count, from_cache=True)
+    resolved = _resolve_with_pytube(entry["url"], i, count, only_audio, cache)
+    if isinstance(resolved, VideoStatus):
+        return skip_video(resolved, entry["url"], i, count, logger.log)
+    video = resolved.video
+    found = find_existing(video.title, video.length, video.watch_url,
+                          i, count, file_type, existing, logger.log)
+    if found is not None:
+        return found
+    return resolved
+
+
+def _duplicate_video(resolved: ResolvedVideo,
+                     logger: ProgressLogger) -> VideoResult:
+    """Reports a video whose output file another video already claimed."""
+    video = resolved.video
+    logger.log(f"Found {resolved.i}/{resolved.count}: {video.title} "
+               f"({format_time(video.length)}) - duplicate")
+    return VideoResult(status=VideoStatus.FOUND,
+                       watch_url=video.watch_url,
+                       length=video.length)
+
+
+def _download_video(resolved: ResolvedVideo,
+                    dir_path: Path,
+                    file_type: str,
+                    logger: ProgressLogger,
+                    canceled: threading.Event,
+                    cache: MetadataCache) -> VideoResult:
+    """Downloads a resolved video and returns it for tagging."""
+    video = resolved.video
+    i, count = resolved.i, resolved.count
+    file_name = sanitize_filename(video.title)
+    file_path = dir_path / f"{file_name}.{file_type}"
+    if canceled.is_set():
+        return VideoResult(status=VideoStatus.CANCELED,
+                           watch_url=video.watch_url)
+    logger.log(f"Downloading {i}/{count}: {video.title} "
+               f"({format_time(video.length)})")
+    cover_data = fetch_url_raw(video.thumbnail_url)
+    metadata = Metadata(title=video.title,
+                        artist=video.author,
+                        cover_data=cover_data)
+    try:
+        try:
+            download_functions[file_type](video.stream_url, dir_path,
+                                          file_name, canceled)
+        except requests.HTTPError as e:
+            if (not resolved.from_cache or e.response is None
+                    or e.response.status_code != 403):
+                raise e
+            # The cached stream URL was rejected, so resolve it again.
+            fresh = _resolve_with_pytube(video.watch_url, i, count,
+                                         video.only_audio, cache)
+            if isinstance(fresh, VideoStatus):
+                return skip_video(fresh, video.watch_url, i, count,
+                                  logger.log)
+            download_functions[file_type](fresh.video.stream_url, dir_path,
+                                          file_name, canceled)
+    except DownloadCanceled:
+        # Partial `.part` files are kept so the next run can resume them.
+        return VideoResult(status=VideoStatus.CANCELED,
+                           watch_url=video.watch_url)
+    result = VideoResult(status=VideoStatus.DOWNLOADED,
+                         watch_url=video.watch_url,
+                         length=video.length,
+                         description=f"{i}/{count}: {video.title}",
+                         file_path=file_path,
+                         metadata=metadata)
+    if canceled.is_set():
+        # Finished just as the playlist was canceled, so the tag stage
+        # may be gone; tag it here rather than lose the download.
+        return _tag_video(result, file_type, logger)
+    return result
+
+
+def _tag_video(result: VideoResult,
+               file_type: str,
+               logger: ProgressLogger) -> VideoResult:
+    """Writes the metadata of a downloaded video into its file."""
+    assert result.file_path is not None and result.metadata is not None
+    file_path = result.file_path
+    if file_type in metadata_functions:
+        metadata_functions[file_type](file_path, result.metadata)
+    file_size = file_path.stat().st_size
+    logger.log(f"Downloaded {result.description} - {format_size(file_size)}")
+    return VideoResult(status=VideoStatus.DOWNLOADED,
+                       watch_url=result.watch_url,
+                       length=result.length,
+                       file_size=file_size)
+
+
+def print_summary(title: str,
+                  count: int,
+                  dir_path: Path,
+                  results: list[VideoResult]) -> None:
+    """Prints the totals of a finished playlist download."""
+    total_secs = 0
+    bytes_downloaded = 0
+    vids_downloaded = 0
+    total_bytes = 0
+    age_restricted_urls: list[str] = []
+    for result in results:
+        match result.status:
+            case VideoStatus.AGE_RESTRICTED:
+                age_restricted_urls.append(result.watch_url)
+            case VideoStatus.FOUND:
+                total_secs += result.length
+                total_bytes += result.file_size
+            case VideoStatus.DOWNLOADED:
+                total_secs += result.length
+                total_bytes += result.file_size
+                bytes_downloaded += result.file_size
+                vids_downloaded += 1
+
+    print(f"\nFinished downloading playlist: {title}")
+    if vids_downloaded == count:
+        print(f"\tTotal videos: {count}")
+    else:
+        print(f"\tDownloaded videos: {vids_downloaded} / {count}")
+    if bytes_downloaded == total_bytes:
+        print(f"\tTotal size: {format_size(bytes_downloaded)}")
+    else:
+        print(f"\tDownloaded size: {format_size(bytes_downloaded)} / "
+                                 f"{format_size(total_bytes)}")
+    print(f"\tTotal length: {format_time(total_secs, long=True)}")
+    print(f"\tDestination: `{str(dir_path)}`")
+    if len(age_restricted_urls) != 0:
+        print(f"\nAge restricted videos: ({len(age_restricted_urls)})")
+        for restricted_url in age_restricted_urls:
+            print(f"\t{restricted_url}")
+
+
 def download_playlist(playlist_url: str,
                       output: Optional[str],
                       file_type: str,
                       only_audio: bool) -> None:
     """Downloads all videos in a specified YouTube playlist.
     Downloads into `~/Music/<TITLE>/` or `~/Videos/<TITLE>/` by default.
+    Up to `MAX_WORKERS` videos are downloaded concurrently.
 
     # Parameters
     ------------
@@ -137,119 +512,119 @@ def download_playlist(playlist_url: str,
     """
     assert file_type in download_functions
 
-    playlist = Playlist(playlist_url)
-    dir_path = get_and_validate_dir_path(output, playlist.title, only_audio)
-    total_secs = 0
-    bytes_downloaded = 0
-    vids_downloaded = 0
-    total_bytes = 0
-    age_restricted_urls: list[str] = []
-    print(f"Downloading playlist: {playlist.title}\n")
-    for i, vid in enumerate(playlist.videos, start=1):
-        stream: Optional[Stream]
-        try:
-            stream = vid.streams\
-                        .filter(file_extension="mp4",
-                                only_audio=only_audio)\
-                        .first()
-        except AgeRestrictedError:
-            age_restricted_urls.append(vid.watch_url)
-            print("Video is age restricted")
-            continue
-        if stream is None:
-            print("No stream found")
-            continue
-        if only_audio and not stream.includes_audio_track:
-            print("Video has no audio")
-            continue
-        total_secs += vid.length
-        file_name = sanitize_filename(stream.title)
-        file_path = dir_path / f"{file_name}.{file_type}"
-        if file_path.is_file():
-            file_size = file_path.stat().st_size
-            total_bytes += file_size
-            print(f"Found {i}/{playlist.length}: {stream.title} "
-                  f"({format_time(vid.length)})")
-            continue
-        print(f"Downloading {i}/{playlist.length}: {stream.title} "
-              f"({format_time(vid.length)})",
-              end="", flush=True)
-        cover_data = fetch_url_raw(vid.thumbnail_url)
-        metadata = Metadata(title=stream.title,
-                            artist=vid.author,
-                            cover_data=cover_data)
-        try:
-            download_functions[file_type](stream, dir_path, file_name)
-            if file_type in metadata_functions:
-                metadata_functions[file_type](file_path, metadata)
-        except KeyboardInterrupt as e:
-            file_path.unlink(missing_ok=True)
-            print(f"\ndeleted `{str(file_path)}`")
-            raise e
-        vids_downloaded += 1
-        file_size = file_path.stat().st_size
-        bytes_downloaded += file_size
-        total_bytes += file_size
-        print(f" - {format_size(file_size)}")
-
-    print(f"\nFinished downloading playlist: {playlist.title}")
-    if vids_downloaded == playlist.length:
-        print(f"\tTotal videos: {playlist.length}")
-    else:
-        print(f"\tDownloaded videos: {vids_downloaded} / {playlist.length}")
-    if bytes_downloaded == total_bytes:
-        print(f"\tTotal size: {format_size(bytes_downloaded)}")
+    title, entries = flat_playlist(playlist_url)
+    count = len(entries)
+    dir_path = get_and_validate_dir_path(output, title, only_audio)
+    existing = scan_existing_files(dir_path)
+    results: list[VideoResult] = []
+    print(f"Downloading playlist: {title}\n")
+    canceled = threading.Event()
+    cache = MetadataCache()
+    # Streams are resolved ahead of the downloads (a slow page fetch and
+    # cipher resolution), so downloads rarely wait for them.
+    resolve_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    # Tagging rewrites whole files, so it runs off the download workers.
+    tag_executor = ThreadPoolExecutor(max_workers=MAX_TAGGING_WORKERS)
+    # Started last so a failure above never leaves a live display behind.
+    logger = ProgressLogger(count)
+    queued = iter(enumerate(entries, start=1))
+    # Videos being resolved or downloaded, bounded to keep the lookahead short.
+    active = 0
+    pending: set[Future[VideoResult | ResolvedVideo]] = set()
+    tagging: set[Future[VideoResult | ResolvedVideo]] = set()
+    # Output file names already being downloaded, so that repeated videos
+    # and videos sharing a title never write the same files concurrently.
+    claimed: set[str] = set()
+    # Sized once the video that claimed their file has finished.
+    duplicates: list[tuple[VideoResult, Path]] = []
+    try:
+        while True:
+            while (active < MAX_WORKERS + RESOLVE_LOOKAHEAD
+                   and (item := next(queued, None)) is not None):
+                i, entry = item
+                pending.add(resolve_executor.submit(
+                    _resolve_video, entry, i, count, file_type, only_audio,
+                    logger, cache, existing,
+                ))
+                active += 1
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if isinstance(result, ResolvedVideo):
+                    name = f"{sanitize_filename(result.video.title)}" \
+                           f".{file_type}"
+                    if name in claimed:
+                        active -= 1
+                        duplicate = _duplicate_video(result, logger)
+                        duplicates.append((duplicate, dir_path / name))
+                        results.append(duplicate)
+                        logger.advance()
+                        continue
+                    claimed.add(name)
+                    pending.add(executor.submit(
+                        _download_video, result, dir_path, file_type,
+                        logger, canceled, cache,
+                    ))
+                    continue
+                if future in tagging:
+                    tagging.remove(future)
+                else:
+                    active -= 1
+                if result.metadata is not None:
+                    tag_future = tag_executor.submit(
+                        _tag_video, result, file_type, logger,
+                    )
+                    pending.add(tag_future)
+                    tagging.add(tag_future)
+                    continue
+                results.append(result)
+                logger.advance()
+    except BaseException as e:
+        # Skip queued videos; in-flight ones keep their `.part` files.
+        canceled.set()
+        resolve_executor.shutdown(wait=False, cancel_futures=True)
+        executor.shutdown(wait=False, cancel_futures=True)
+        tag_executor.shutdown(wait=False)
+        raise e
     else:
-        print(f"\tDownloaded size: {format_size(bytes_downloaded)} / "
-                                 f"{format_size(total_bytes)}")
-    print(f"\tTotal length: {format_time(total_secs, long=True)}")
-    print(f"\tDestination: `{str(dir_path)}`")
-    if len(age_restricted_urls) != 0:
-        print(f"\nAge restricted videos: ({len(age_restricted_urls)})")
-        for restricted_url in age_restricted_urls:
-            print(f"\t{restricted_url}")
+        resolve_executor.shutdown()
+        executor.shutdown()
+        tag_executor.shutdown()
+    finally:
+        logger.close()
+        cache.close()
 
+    for duplicate, file_path in duplicates:
+        if file_path.exists():
+            duplicate.file_size = file_path.stat().st_size
+    print_summary(title, count, dir_path, results)
 
-def main() -> None:
-    def expect_arg_after(switch: str, i: int) -> None:
-        if i == len(sys.argv) - 1:
-            print(f"Expected an argument after `{switch}`", file=sys.stderr)
-            exit(1)
-
-    playlist_url = None
-    output = None
-    file_type = "mp4"
-    only_audio = False
-    args = sys.argv
-    i = 1
-    while i < len(args):
-        match args[i]:
-            case "-o":
-                expect_arg_after("-o", i)
-                i += 1
-                output = args[i]
-            case "-f":
-                expect_arg_after("-f", i)
-                i += 1
-                file_type = args[i]
-            case "-a":
-                only_audio = True
-            case _:
-                if playlist_url is not None:
-                    print("Multiple playlist URLs provided", file=sys.stderr)
-                    exit(1)
-                playlist_url = args[i]
-        i += 1
-    if file_type in {"mp3"}:
-        only_audio = True
-    if playlist_url is None:
-        print("No playlist URL provided", file=sys.stderr)
-        exit(1)
-    if file_type not in metadata_functions:
-        print(f"Invalid file type `{file_type}`", file=sys.stderr)
-        exit(1)
+
+type PlaylistDownloader = Callable[[str, Optional[str], str, bool], None]
+
+
+def main(download: PlaylistDownloader = download_playlist) -> None:
+    parser = argparse.ArgumentParser(
+        description="Downloads every video of a YouTube playlist.",
+    )
+    parser.add_argument("playlist_url", help="URL of the YouTube playlist")
+    parser.add_argument("-o", dest="output",
+                        help="output directory")
+    parser.add_argument("-f", dest="file_type", default="mp4",
+                        choices=download_functions,
+                        help="output file type (default: mp4)")
+    parser.add_argument("-a", dest="only_audio", action="store_true",
+                        help="only download audio")
+    args = parser.parse_args()
+    playlist_url: str = args.playlist_url
+    output: Optional[str] = args.output
+    file_type: str = args.file_type
+    only_audio: bool = args.only_audio or file_type in {"mp3"}
     try:
-        download_playlist(
+        download(
             playlist_url,
             output,
             file_type,
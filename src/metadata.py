@@ -1,30 +1,47 @@
-from dataclasses import dataclass
-from mutagen.id3 import ID3, TIT2, TPE1, APIC  # type: ignore
-from mutagen.mp3 import MP3
-from mutagen.mp4 import MP4, MP4Cover
+from __future__ import annotations
+
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Callable
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from mutagen import PaddingInfo
+
+# Free space reserved in the `moov` atom so later edits avoid a rewrite.
+MP4_PADDING = 64 * 1024
 
 
 @dataclass(kw_only=True)
 class Metadata:
     title: str
     artist: str
-    cover_data: bytes
+    cover_data: bytes = field(repr=False)
+
+
+def _mp4_padding(info: PaddingInfo) -> int:
+    """Keeps existing padding when the new tags fit into it and
+    reserves `MP4_PADDING` bytes otherwise.
+    """
+    return info.padding if info.padding >= 0 else MP4_PADDING
 
 
 def _set_mp4_metadata(file_path: Path, data: Metadata) -> None:
     """Sets an MP4 file's metadata."""
+    from mutagen.mp4 import MP4, MP4Cover
+
     cover = MP4Cover(data.cover_data, MP4Cover.FORMAT_JPEG)
     vid = MP4(file_path)
     vid["covr"] = [cover]
     vid["\xa9nam"] = [data.title]
     vid["\xa9ART"] = [data.artist]
-    vid.save()
+    vid.save(padding=_mp4_padding)
 
 
 def _set_mp3_metadata(file_path: Path, data: Metadata) -> None:
     """Sets an MP3 file's metadata."""
+    from mutagen.id3 import ID3, TIT2, TPE1, APIC  # type: ignore
+    from mutagen.mp3 import MP3
+
     audio = MP3(file_path, ID3=ID3)
     if audio.tags is None:
         audio.add_tags()